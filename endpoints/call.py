@@ -11,13 +11,19 @@ import types
 import traceback
 import inspect
 import pkgutil
+import threading
+import hashlib
+import json
+import tempfile
+import collections
 
 from .utils import AcceptHeader
 from .http import Response, Request
 from .exception import CallError, Redirect, CallStop, AccessDenied, RouteError, VersionError
 from .decorators import _property
 from .compat.environ import *
-from .reflection import ReflectModule
+from .reflection import ReflectModule, ReflectPath, clear_import_errors
+from . import environ
 
 
 logger = logging.getLogger(__name__)
@@ -144,20 +150,23 @@ class Call(object):
         res = self.response
         con = self.controller
 
+        # CallStop, Redirect, and CallError are raised on purpose to send back a
+        # certain response so they don't need a traceback, any error that caused
+        # them (eg, the ImportError behind a 404) is logged where it was caught
         if isinstance(e, CallStop):
-            logger.info(str(e), exc_info=True)
+            logger.info(str(e))
             res.code = e.code
             res.add_headers(e.headers)
             res.body = e.body
 
         elif isinstance(e, Redirect):
-            logger.info(str(e), exc_info=True)
+            logger.info(str(e))
             res.code = e.code
             res.add_headers(e.headers)
             res.body = None
 
         elif isinstance(e, (AccessDenied, CallError)):
-            logger.warning(str(e), exc_info=True)
+            logger.warning("{} {} -> {} {}".format(req.method, req.path, e.code, e))
             res.code = e.code
             res.add_headers(e.headers)
             res.body = e
@@ -223,32 +232,110 @@ class Router(object):
     """
     default_class_name = "Default"
 
+    eager_import = True
+    """if True, all the found controller modules will be imported when the module
+    cache is populated instead of when the first request for each module comes in"""
+
     _module_name_cache = {}
 
+    _module_name_lock = threading.Lock()
+
+    _resolve_caches = {}
+    """router class -> OrderedDict LRU of that class's resolve() results"""
+
+    _resolve_lock = threading.Lock()
+
+    resolve_cache_size = 1024
+    """how many path resolutions resolve() will remember for this router class,
+    when full the least recently used resolution is forgotten"""
+
+    _module_trie_cache = {}
+
     @property
     def module_names(self):
         """get all the modules in the controller_prefixes
 
-        :returns: set, a set of string module names
+        :returns: frozenset, a set of string module names
         """
-        ret = set()
-        _module_name_cache = type(self)._module_name_cache
-
+        ret = None
         for controller_prefix in self.controller_prefixes:
+            module_names = self.get_module_names(controller_prefix)
 
-            if controller_prefix in _module_name_cache:
-                ret.update(_module_name_cache[controller_prefix])
+            # the cached sets are frozen so with only one controller prefix (the
+            # common case) we can hand back the cached set without copying it
+            ret = module_names if ret is None else ret.union(module_names)
 
-            else:
-                logger.debug("Populating module cache for controller_prefix {}".format(controller_prefix))
-                rm = ReflectModule(controller_prefix)
-                module_names = rm.module_names
+        return ret
 
-                #_module_name_cache.setdefault(controller_prefix, {})
-                type(self)._module_name_cache[controller_prefix] = module_names
-                ret.update(module_names)
+    def get_module_names(self, controller_prefix):
+        """get all the modules in controller_prefix, finding them the first time
+        a controller_prefix is seen
 
-        return ret
+        :param controller_prefix: string, the controller prefix module
+        :returns: frozenset, a set of string module names
+        """
+        _module_name_cache = type(self)._module_name_cache
+        module_names = _module_name_cache.get(controller_prefix, None)
+        if module_names is None:
+            # the prefix package is imported before taking the lock so a slow
+            # package doesn't hold up the first request of every other prefix,
+            # and a package that uses a Router while it is being imported finds
+            # the names itself instead of waiting on us
+            ReflectModule(controller_prefix).module
+
+            found = False
+            with type(self)._module_name_lock:
+                # another thread might have populated the cache while we
+                # were waiting on the lock
+                module_names = _module_name_cache.get(controller_prefix, None)
+                if module_names is None:
+                    logger.debug("Populating module cache for controller_prefix {}".format(controller_prefix))
+                    module_names = self.find_module_names(controller_prefix)
+                    _module_name_cache[controller_prefix] = module_names
+                    found = True
+
+            # the modules are imported outside the lock (and after the names are
+            # cached) because a controller module could use a Router while it is
+            # being imported, and the other prefixes shouldn't have to wait on
+            # all these imports
+            if found and self.eager_import:
+                self.import_module_names(module_names)
+
+        return module_names
+
+    def get_module_trie(self, controller_prefix):
+        """get the modules in controller_prefix as a trie of path segments
+
+        controller_prefix.foo.bar would be {"foo": {"bar": {}}}, this lets
+        get_module_name() walk the path args one dict lookup at a time instead
+        of building a module name string for every segment
+
+        :param controller_prefix: string, the controller prefix module
+        :returns: dict, each key is a submodule name and each value is the dict
+            of that submodule's submodules
+        """
+        _module_trie_cache = type(self)._module_trie_cache
+        trie = _module_trie_cache.get(controller_prefix, None)
+        if trie is None:
+            trie = {}
+            # sorted guarantees a parent is added before any of its children,
+            # a module whose parent isn't a found module is unreachable by
+            # path so it isn't added
+            for module_name in sorted(self.get_module_names(controller_prefix)):
+                bits = module_name.split(".")[len(controller_prefix.split(".")):]
+                if bits:
+                    node = trie
+                    for bit in bits[:-1]:
+                        node = node.get(bit, None)
+                        if node is None:
+                            break
+
+                    if node is not None:
+                        node[bits[-1]] = {}
+
+            _module_trie_cache[controller_prefix] = trie
+
+        return trie
 
     def __init__(self, controller_prefixes):
         if not controller_prefixes:
@@ -256,12 +343,185 @@ class Router(object):
 
         self.controller_prefixes = controller_prefixes
 
+    def find_module_names(self, controller_prefix):
+        """find all the module names of controller_prefix
+
+        if environ.MODULE_CACHE_DIR is set then the found module names will be
+        saved there, along with the modified times of all the directories that were
+        listed, so the next process can load them instead of walking the controller
+        package, if any of the directories changed the package will be walked again
+
+        :param controller_prefix: string, the controller prefix (eg, foo.controllers)
+        :returns: frozenset, the module names
+        """
+        rm = ReflectModule(controller_prefix)
+        cache_dir = environ.MODULE_CACHE_DIR
+        module = rm.module
+        if not cache_dir or not hasattr(module, "__path__"):
+            return frozenset(rm.module_names)
+
+        basedir = module.__path__[0]
+        cache_path = os.path.join(
+            cache_dir,
+            "endpoints-{}.json".format(
+                hashlib.md5("{}:{}".format(controller_prefix, basedir).encode("UTF-8")).hexdigest()
+            )
+        )
+
+        try:
+            # the cache is plain json (not pickle) so a file someone else put
+            # in the cache directory can't run code in this process
+            with open(cache_path, "r") as fp:
+                cached = json.load(fp)
+
+            for path, mtime in cached["mtimes"].items():
+                if os.stat(path).st_mtime != mtime:
+                    break
+
+            else:
+                module_names = frozenset(cached["module_names"])
+                # only names inside controller_prefix will ever be imported
+                for module_name in module_names:
+                    if module_name != controller_prefix and not module_name.startswith(controller_prefix + "."):
+                        raise ValueError("{} is not in {}".format(module_name, controller_prefix))
+
+                logger.debug("Loaded module names for controller_prefix {} from {}".format(
+                    controller_prefix,
+                    cache_path
+                ))
+                return module_names
+
+        except Exception:
+            # the cache file doesn't exist yet or a directory was removed
+            pass
+
+        # a new module or package always changes the modified time of the
+        # directory it was added to, that includes a plain directory that becomes
+        # a package, so we check every directory the walk listed
+        dirpaths = set()
+        module_names = set([controller_prefix])
+        module_names.update(ReflectPath(basedir).find_module_names(basedir, controller_prefix, dirpaths))
+        module_names = frozenset(module_names)
+
+        mtimes = {}
+        for path in dirpaths:
+            mtimes[path] = os.stat(path).st_mtime
+
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            with os.fdopen(fd, "w") as fp:
+                json.dump({"module_names": sorted(module_names), "mtimes": mtimes}, fp)
+
+            # os.rename() fails on windows if cache_path exists, python 2 doesn't
+            # have os.replace() though
+            getattr(os, "replace", os.rename)(tmp_path, cache_path)
+            tmp_path = None
+
+        except (IOError, OSError, TypeError, ValueError) as e:
+            logger.warning(e, exc_info=True)
+
+        finally:
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        return module_names
+
+    def import_module_names(self, module_names):
+        """import all the module_names so requests will find them in sys.modules
+
+        a module that fails to import is logged and skipped, the failure isn't
+        remembered (a failure at startup could be transient) so the module will
+        be imported again when a request actually routes to it
+
+        :param module_names: set, the module names to import
+        """
+        for module_name in module_names:
+            try:
+                ReflectModule(module_name).module
+
+            except Exception:
+                logger.warning(
+                    "Could not import controller module {}".format(module_name),
+                    exc_info=True
+                )
+                clear_import_errors(module_name)
+
     def find(self, req, res):
-        ret = {}
-        controller_path = []
+        path_args = list(req.path_args)
+
+        (
+            controller_module,
+            controller_module_name,
+            module_path,
+            controller_class,
+            controller_class_name,
+            class_path,
+            consumed
+        ) = self.resolve(path_args)
+
+        if not controller_class:
+            raise TypeError(
+                "Could not find a valid module and Controller class for {}".format(
+                    req.path
+                )
+            )
+
+        # we merge the leftover path args with the body kwargs
+        controller_method_args = path_args[consumed:]
+        controller_method_args.extend(req.body_args)
 
-        module_name, module_path, controller_method_args = self.get_module_name(list(req.path_args))
-        controller_module_name = module_name
+        ret = {
+            'module': controller_module,
+            'module_name': controller_module_name,
+            'module_path': module_path,
+
+            'class': controller_class,
+            'class_name': controller_class_name,
+            'class_instance': self.get_class_instance(req, res, controller_class),
+            'class_path': class_path,
+
+            'method_args': controller_method_args,
+            'method_kwargs': req.kwargs,
+        }
+
+        req.controller_info = ret
+        return ret
+
+    def resolve(self, path_args):
+        """find the controller module and class that should handle path_args
+
+        The result only depends on the router class, the path args and the
+        controller prefixes so it is cached at the class level (a new Router is
+        created for every request). Each router class gets its own cache so a child
+        that resolves differently, or has a different resolve_cache_size, doesn't
+        touch anyone else's. Paths with ids in them (eg, /users/<id>) are all
+        different keys so the cache is an LRU to keep the busy paths around
+
+        :param path_args: list, the path bits of the request (eg, /foo/bar is [foo, bar])
+        :returns: tuple, (module, module_name, module_path, class, class_name,
+            class_path, consumed) where consumed is how many of path_args were
+            used to find the module and class, the rest are the method args
+        """
+        _resolve_lock = Router._resolve_lock
+        key = (tuple(self.controller_prefixes), tuple(path_args))
+        with _resolve_lock:
+            _resolve_cache = Router._resolve_caches.get(type(self), None)
+            if _resolve_cache is None:
+                _resolve_cache = collections.OrderedDict()
+                Router._resolve_caches[type(self)] = _resolve_cache
+
+            ret = _resolve_cache.pop(key, None)
+            if ret is not None:
+                # move it to the end so it is the most recently used
+                _resolve_cache[key] = ret
+                return ret
+
+        controller_path = []
+        module_name, module_path, controller_method_args = self.get_module_name(list(path_args))
         controller_module = ReflectModule(module_name).module
 
         controller_class = None
@@ -279,29 +539,22 @@ class Router(object):
             controller_class_name = self.default_class_name
             controller_class = self.get_class(controller_module, controller_class_name)
 
-        if not controller_class:
-            raise TypeError(
-                "Could not find a valid module and Controller class for {}".format(
-                    req.path
-                )
-            )
-
-        ret['module'] = controller_module
-        ret['module_name'] = controller_module_name
-        ret['module_path'] = "/".join(module_path)
-
-        ret['class'] = controller_class
-        ret['class_name'] = controller_class_name
-        ret['class_instance'] = self.get_class_instance(req, res, controller_class)
-        ret['class_path'] = "/".join(controller_path)
-
-        # we merge the leftover path args with the body kwargs
-        controller_method_args.extend(req.body_args)
+        ret = (
+            controller_module,
+            module_name,
+            "/".join(module_path),
+            controller_class,
+            controller_class_name,
+            "/".join(controller_path),
+            len(path_args) - len(controller_method_args)
+        )
 
-        ret['method_args'] = controller_method_args
-        ret['method_kwargs'] = req.kwargs
+        if controller_class:
+            with _resolve_lock:
+                _resolve_cache[key] = ret
+                while len(_resolve_cache) > self.resolve_cache_size:
+                    _resolve_cache.popitem(last=False)
 
-        req.controller_info = ret
         return ret
 
     def get_class_instance(self, req, res, controller_class):
@@ -320,21 +573,14 @@ class Router(object):
         # using the path_args we are going to try and find the best module path
         # for the request
         if path_args:
-            cset = self.module_names
             for controller_prefix in self.controller_prefixes:
-                mod_name = controller_prefix + "." + path_args[0]
-                if mod_name in cset:
-                    module_name = mod_name
-                    module_path.append(path_args.pop(0))
-
-                    while path_args:
-                        mod_name += "." + path_args[0]
-                        if mod_name in cset:
-                            module_name = mod_name
-                            module_path.append(path_args.pop(0))
-                        else:
-                            break
+                node = self.get_module_trie(controller_prefix)
+                if path_args[0] in node:
+                    while path_args and path_args[0] in node:
+                        node = node[path_args[0]]
+                        module_path.append(path_args.pop(0))
 
+                    module_name = ".".join([controller_prefix] + module_path)
                     break
 
         if not module_name:
@@ -377,7 +623,8 @@ class Router(object):
         # let's get the class
         class_name = class_name.capitalize()
         class_object = getattr(module, class_name, None)
-        logger.debug("Getting class {}.{}".format(module.__name__, class_name))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Getting class {}.{}".format(module.__name__, class_name))
         if not class_object or not issubclass(class_object, Controller):
             class_object = None
 
@@ -527,12 +774,14 @@ class Controller(object):
 
         res_error_handler = None
         controller_methods = self.find_methods()
+        module_name = req.controller_info['module_name']
+        class_name = req.controller_info['class_name']
         #controller_args, controller_kwargs = self.find_method_params()
         for controller_method_name, controller_method in controller_methods:
             try:
                 self.logger.debug("Attempting to handle request with {}.{}.{}".format(
-                    req.controller_info['module_name'],
-                    req.controller_info['class_name'],
+                    module_name,
+                    class_name,
                     controller_method_name
                 ))
                 res.body = controller_method(
@@ -548,8 +797,8 @@ class Controller(object):
                     res_error_handler = getattr(e.instance, "handle_failure", None)
 
                 self.logger.debug("Request {}.{}.{} failed version check [{} not in {}]".format(
-                    req.controller_info['module_name'],
-                    req.controller_info['class_name'],
+                    module_name,
+                    class_name,
                     controller_method_name,
                     e.request_version,
                     e.versions
@@ -560,8 +809,8 @@ class Controller(object):
                     res_error_handler = getattr(e.instance, "handle_failure", None)
 
                 self.logger.debug("Request {}.{}.{} failed routing check".format(
-                    req.controller_info['module_name'],
-                    req.controller_info['class_name'],
+                    module_name,
+                    class_name,
                     controller_method_name
                 ))
 
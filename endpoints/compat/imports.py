@@ -58,3 +58,27 @@ elif is_py3:
 #     from urllib.error import URLError, HTTPError
 #     from urllib.parse import urlencode
 
+
+try:
+    # https://www.python.org/dev/peps/pep-0471/ (python 3.5+)
+    from os import scandir
+
+except ImportError:
+    try:
+        from scandir import scandir
+
+    except ImportError:
+        import os
+
+        class _DirEntry(object):
+            """bare bones stand-in for os.DirEntry when scandir isn't available"""
+            def __init__(self, dirpath, name):
+                self.name = name
+                self.path = os.path.join(dirpath, name)
+
+            def is_dir(self):
+                return os.path.isdir(self.path)
+
+        def scandir(path="."):
+            for name in os.listdir(path):
+                yield _DirEntry(path, name)
@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
 import logging
-import inspect
-import re
 
 from ..exception import CallError, RouteError, VersionError
 from ..http import Url
@@ -80,21 +78,23 @@ class route_path(route):
     """
     def handle_definition(self, *paths, **kwargs):
         self.paths = paths
+        # the paths are fixed when the method is decorated, so only normalize them once
+        self.normalized_paths = tuple(Url.normalize_paths(paths))
+        self.normalized_paths_count = len(self.normalized_paths)
 
     def handle(self, request):
         ret = True
-        pas = Url.normalize_paths(self.paths)
+        pas = self.normalized_paths
         method_args = request.controller_info["method_args"]
-        for i, p in enumerate(pas):
-            try:
-                if method_args[i] != p:
+        if len(method_args) < self.normalized_paths_count:
+            ret = False
+
+        else:
+            for a, p in zip(method_args, pas):
+                if a != p:
                     ret = False
                     break
 
-            except IndexError:
-                ret = False
-                break
-
         return ret
 
 
@@ -113,6 +113,7 @@ class route_param(route):
     def handle_definition(self, *keys, **matches):
         self.keys = keys
         self.matches = matches
+        self.match_items = tuple(matches.items())
 
     def handle(self, request):
         ret = True
@@ -123,13 +124,8 @@ class route_param(route):
                 break
 
         if ret:
-            for k, v in self.matches.items():
-                try:
-                    if type(v)(method_kwargs[k]) != v:
-                        ret = False
-                        break
-
-                except KeyError:
+            for k, v in self.match_items:
+                if k not in method_kwargs or type(v)(method_kwargs[k]) != v:
                     ret = False
                     break
 
@@ -161,7 +157,7 @@ class version(route):
     a unique name (ie, there can be no just GET method, they have to be GET_1, etc.)
     """
     def handle_definition(self, *versions):
-        self.versions = set(versions)
+        self.versions = frozenset(versions)
 
     def handle_args(self, controller, controller_args, controller_kwargs):
         return [controller]
@@ -19,6 +19,11 @@ HOST = get("HOST", "")
 """The host string, usually just domain or domain:port, this is used by the server
 classes and also the tests"""
 
+MODULE_CACHE_DIR = get("MODULE_CACHE_DIR", "")
+"""If set, the controller module names found by the Router will be saved to this
+directory so new processes don't have to walk the controller packages again"""
+
+
 def set_host(host, environ=None):
     global HOST
     os.environ["ENDPOINTS_HOST"] = host
@@ -43,6 +43,12 @@ class Headers(BaseHeaders, Mapping):
     actual python3 code:
         https://github.com/python/cpython/blob/master/Lib/wsgiref/headers.py
     """
+    _name_cache = {}
+
+    name_cache_size = 1024
+    """how many normalized header names _convert_string_name() will remember
+    before starting over"""
+
     def __init__(self, headers=None, **kwargs):
         super(Headers, self).__init__([])
         self.update(headers, **kwargs)
@@ -62,10 +68,25 @@ class Headers(BaseHeaders, Mapping):
         return bit
 
     def _convert_string_name(self, k):
-        """converts things like FOO_BAR to Foo-Bar which is the normal form"""
-        k = String(k, "iso-8859-1")
-        bits = k.lower().replace('_', '-').split('-')
-        return "-".join((self._convert_string_part(bit) for bit in bits))
+        """converts things like FOO_BAR to Foo-Bar which is the normal form
+
+        every header get and set goes through here and the same handful of names
+        come up over and over so the normalized names are cached, the class is
+        part of the key since a child could normalize the parts differently
+        """
+        _name_cache = Headers._name_cache
+        key = (type(self), k)
+        name = _name_cache.get(key, None)
+        if name is None:
+            k = String(k, "iso-8859-1")
+            bits = k.lower().replace('_', '-').split('-')
+            name = "-".join((self._convert_string_part(bit) for bit in bits))
+
+            if len(_name_cache) >= self.name_cache_size:
+                _name_cache.clear()
+            _name_cache[key] = name
+
+        return name
 
     def _convert_string_type(self, v):
         """Override the internal method wsgiref.headers.Headers uses to check values
@@ -878,6 +899,11 @@ class Request(Http):
     controller_info = None
     """will hold the controller information for the request, populated from the Call"""
 
+    version_cache_size = 256
+    """how many accept header versions version() will remember before starting over"""
+
+    _version_cache = {}
+
     @property
     def accept_encoding(self):
         """The encoding the client requested the response to use"""
@@ -1095,10 +1121,21 @@ class Request(Http):
         v = ""
         accept_header = self.get_header('accept', "")
         if accept_header:
-            a = AcceptHeader(accept_header)
-            for mt in a.filter(content_type):
-                v = mt[2].get("version", "")
-                if v: break
+            # clients tend to send the same accept header on every request, so
+            # we remember the parsed version instead of parsing it every time
+            _version_cache = type(self)._version_cache
+            key = (accept_header, content_type)
+            v = _version_cache.get(key, None)
+            if v is None:
+                v = ""
+                a = AcceptHeader(accept_header)
+                for mt in a.filter(content_type):
+                    v = mt[2].get("version", "")
+                    if v: break
+
+                if len(_version_cache) >= self.version_cache_size:
+                    _version_cache.clear()
+                _version_cache[key] = v
 
         return v
 
@@ -1203,10 +1240,16 @@ class Response(Http):
 
     encoding = ""
 
+    # these are set at the class level so the properties can read them directly
+    # instead of having to check if they have been set yet
+    _code = None
+    _status = None
+    _body = None
+
     @property
     def code(self):
         """the http status code to return to the client, by default, 200 if a body is present otherwise 204"""
-        code = getattr(self, '_code', None)
+        code = self._code
         if not code:
             if self.has_body():
                 code = 200
@@ -1228,7 +1271,7 @@ class Response(Http):
     @property
     def status(self):
         """The full http status (the first line of the headers in a server response)"""
-        if not getattr(self, '_status', None):
+        if not self._status:
             c = self.code
             status_tuple = BaseHTTPRequestHandler.responses.get(self.code)
             msg = "UNKNOWN"
@@ -1245,7 +1288,7 @@ class Response(Http):
     @property
     def body(self):
         """return the body, formatted to the appropriate content type"""
-        return getattr(self, "_body", None)
+        return self._body
 
     @body.setter
     def body(self, v):
@@ -1270,7 +1313,7 @@ class Response(Http):
 
     def has_body(self):
         """return True if there is an actual response body"""
-        return getattr(self, "_body", None) is not None
+        return self._body is not None
 
     def is_file(self):
         """return True if the response body is a file pointer"""
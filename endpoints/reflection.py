@@ -8,15 +8,102 @@ import re
 import fnmatch
 import ast
 import collections
+import traceback
 #import keyword
-from .compat.imports import builtins
+from .compat.imports import builtins, scandir
 from .compat.environ import *
-import pkgutil
 
 from .decorators import _property, version, param
 from .utils import String
 
 
+_import_errors = {}
+"""module_name -> (message, traceback text) of modules that exist but failed to
+import, see _cached_import()"""
+
+
+def clear_import_errors(module_name=""):
+    """forget remembered import failures so the modules will be imported again the
+    next time they are requested
+
+    :param module_name: string, the module to forget, if empty all remembered
+        failures are forgotten
+    """
+    if module_name:
+        _import_errors.pop(module_name, None)
+    else:
+        _import_errors.clear()
+
+
+def _cached_import(module_name, _modules=sys.modules):
+    """return the module at module_name, checking sys.modules before going through
+    the full import machinery
+
+    importlib.import_module() will walk the finders and grab the import lock even
+    when the module has already been imported, this lookup happens on every request
+    so we short circuit it for the common case. A module that is still being
+    imported (by another thread) is already in sys.modules but isn't finished,
+    those go through import_module() so we wait on the module's import lock
+    instead of returning a half executed module
+
+    A module that exists but raises an ImportError while being imported (eg, one
+    of its own imports is missing) is remembered so every request that routes to
+    it doesn't have to run through the import machinery and the module's code
+    again just to fail the same way, see clear_import_errors(). Only the text of
+    the failure is kept (keeping the traceback would keep the frames, and the
+    request, of the first failure alive) so later failures are a new ImportError
+    whose message ends with the file and line that originally failed and whose
+    .traceback is the original formatted traceback. Modules that don't exist at
+    all aren't remembered since they could be created later
+
+    :param module_name: string, the full module path (eg foo.bar.che)
+    :returns: module
+    """
+    module = _modules.get(module_name, None)
+    if module is not None:
+        # python 2 modules don't have a __spec__
+        if getattr(getattr(module, "__spec__", None), "_initializing", False):
+            module = importlib.import_module(module_name)
+
+    else:
+        error = _import_errors.get(module_name, None)
+        if error is not None:
+            e = ImportError(error[0])
+            e.traceback = error[1]
+            raise e
+
+        try:
+            module = importlib.import_module(module_name)
+
+        except ImportError as e:
+            # python 2 ImportErrors don't have a name, so they are never remembered
+            name = getattr(e, "name", None) or module_name
+            if name != module_name and not module_name.startswith(name + "."):
+                exc_info = sys.exc_info()
+                try:
+                    message = String(e)
+                    frames = traceback.extract_tb(exc_info[2])
+                    if frames:
+                        message = "{} ({}:{})".format(
+                            message,
+                            os.path.basename(frames[-1][0]),
+                            frames[-1][1]
+                        )
+
+                    if len(_import_errors) >= 4096:
+                        _import_errors.clear()
+                    _import_errors[module_name] = (
+                        message,
+                        "".join(traceback.format_exception(*exc_info))
+                    )
+
+                finally:
+                    exc_info = None
+            raise
+
+    return module
+
+
 class ReflectDecorator(object):
     """The information of each individual decorator on a given ReflectMethod will
     be wrapped in this class"""
@@ -549,7 +636,7 @@ class ReflectModule(object):
     @property
     def module(self):
         """return the actual python module found at self.module_name"""
-        return importlib.import_module(self.module_name)
+        return _cached_import(self.module_name)
         #return self.get_module(self.module_name)
 
     @property
@@ -641,37 +728,59 @@ class ReflectPath(object):
         for module_name in self.module_names:
             yield ReflectModule(module_name)
 
-    def find_module_names(self, path, prefix=""):
+    def find_module_names(self, path, prefix="", dirpaths=None):
         """recursive method that will find all the modules of the given path
 
         :param path: string, the path to scan for modules/submodules
         :param prefix: string, if you want found modules to be prefixed with a certain
             module path
+        :param dirpaths: set, if passed in every directory that was listed while
+            looking for modules will be added to it
         :returns: set, a set of submodule names under path prefixed with prefix
         """
+        if dirpaths is not None:
+            dirpaths.add(path)
+        return self._find_module_names(scandir(path), prefix, dirpaths)
+
+    def _find_module_names(self, entries, prefix="", dirpaths=None):
+        """the actual recursive scan of find_module_names()
+
+        this mirrors what pkgutil.iter_modules() finds but every directory is
+        only listed once, a sub directory's entries are used to decide if it is
+        a package and then are reused to find its submodules
+
+        :param entries: iterable, the DirEntry instances of the directory
+        :param prefix: string, the module path of the directory
+        :param dirpaths: set, see find_module_names()
+        :returns: set, a set of submodule names prefixed with prefix
+        """
         module_names = set()
-#         if prefix:
-#             module_names = set([prefix])
-#         else:
-#             module_names = set()
-
-        # https://docs.python.org/2/library/pkgutil.html#pkgutil.iter_modules
-        for module_info in pkgutil.iter_modules([path]):
-            # we want to ignore any "private" modules
-            if module_info[1].startswith('_'): continue
-
-            if prefix:
-                module_prefix = ".".join([prefix, module_info[1]])
-            else:
-                module_prefix = module_info[1]
+        prefix = prefix + "." if prefix else ""
+        for entry in entries:
+            name = entry.name
+            # we want to ignore any "private" modules and hidden files/directories
+            # (eg, .git), checking before is_dir() saves a stat() on them
+            if name.startswith(("_", ".")): continue
+
+            if entry.is_dir():
+                if '.' in name: continue
+
+                module_prefix = prefix + name
+                subentries = list(scandir(entry.path))
+                if dirpaths is not None:
+                    dirpaths.add(entry.path)
+
+                for subentry in subentries:
+                    if inspect.getmodulename(subentry.name) == "__init__":
+                        # directory is a package
+                        module_names.add(module_prefix)
+                        module_names.update(self._find_module_names(subentries, module_prefix, dirpaths))
+                        break
 
-            if module_info[2]:
-                # module is a package
-                module_names.add(module_prefix)
-                submodule_names = self.find_module_names(os.path.join(path, module_info[1]), module_prefix)
-                module_names.update(submodule_names)
             else:
-                module_names.add(module_prefix)
+                module_name = inspect.getmodulename(name)
+                if module_name and '.' not in module_name:
+                    module_names.add(prefix + module_name)
 
         return module_names
 
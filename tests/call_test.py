@@ -2,10 +2,15 @@
 from __future__ import unicode_literals, division, print_function, absolute_import
 from . import TestCase, skipIf, SkipTest, Server
 import os
+import sys
+import json
+import threading
+import time
 
 import testdata
 
 import endpoints
+from endpoints import environ, reflection
 from endpoints.environ import *
 from endpoints.utils import ByteString
 from endpoints.http import Request, Response
@@ -13,6 +18,15 @@ from endpoints.call import Controller, Router
 from endpoints.exception import CallError
 
 
+DEFAULT_CONTROLLER = [
+    "from endpoints import Controller",
+    "class Default(Controller):",
+    "    def GET(*args, **kwargs): pass",
+    "",
+]
+"""contents of a controller module with a Default controller that answers any GET"""
+
+
 class ControllerTest(TestCase):
     def test_cors(self):
         class Cors(Controller):
@@ -28,8 +42,10 @@ class ControllerTest(TestCase):
         c = Cors(req, res)
         self.assertEqual(req.get_header('Origin'), c.response.get_header('Access-Control-Allow-Origin')) 
 
-        req.set_header('Access-Control-Request-Method', 'POST')
-        req.set_header('Access-Control-Request-Headers', 'xone, xtwo')
+        req.add_headers({
+            'Access-Control-Request-Method': 'POST',
+            'Access-Control-Request-Headers': 'xone, xtwo',
+        })
         c = Cors(req, res)
         c.OPTIONS()
         self.assertEqual(req.get_header('Origin'), c.response.get_header('Access-Control-Allow-Origin'))
@@ -118,11 +134,329 @@ class RouterTest(TestCase):
         self.assertEqual(info['module_name'], controller_prefix)
         self.assertEqual(info['class_name'], "Default")
 
-        r = Router([controller_prefix])
         info = r.find(*self.get_http_instances("/foo/che/baz"))
         self.assertEqual(2, len(info['method_args']))
         self.assertEqual(info['class_name'], "Foo")
 
+    def test_resolve_cache(self):
+        """make sure a cached resolution doesn't share the method args between
+        requests"""
+        controller_prefix = "resolvecache"
+        testdata.create_module(controller_prefix, contents=[
+            "from endpoints import Controller",
+            "class Foo(Controller):",
+            "    def GET(self, *args): pass",
+        ])
+
+        r = Router([controller_prefix])
+        info = r.find(*self.get_http_instances("/foo/bar"))
+        self.assertEqual("Foo", info['class_name'])
+        self.assertEqual(["bar"], info['method_args'])
+        info['method_args'].append("che")
+
+        info = r.find(*self.get_http_instances("/foo/bar"))
+        self.assertEqual("Foo", info['class_name'])
+        self.assertEqual(["bar"], info['method_args'])
+
+    def test_resolve_cache_router_class(self):
+        """a child router shouldn't get the cached resolutions of its parent"""
+        controller_prefix = "resolvecacheclass"
+        testdata.create_module(controller_prefix, contents=[
+            "from endpoints import Controller",
+            "class Default(Controller):",
+            "    def GET(self): pass",
+            "class Other(Controller):",
+            "    def GET(self): pass",
+        ])
+
+        class OtherRouter(Router):
+            default_class_name = "Other"
+
+        info = Router([controller_prefix]).find(*self.get_http_instances("/"))
+        self.assertEqual("Default", info['class_name'])
+
+        info = OtherRouter([controller_prefix]).find(*self.get_http_instances("/"))
+        self.assertEqual("Other", info['class_name'])
+
+    def test_resolve_cache_lru(self):
+        controller_prefix = "resolvecachelru"
+        testdata.create_module(controller_prefix, contents=[
+            "from endpoints import Controller",
+            "class Foo(Controller):",
+            "    def GET(self, *args): pass",
+        ])
+
+        # these should survive the small child router's evictions
+        r = Router([controller_prefix])
+        for path in ["/foo/4", "/foo/5", "/foo/6"]:
+            r.find(*self.get_http_instances(path))
+
+        class LRURouter(Router):
+            resolve_cache_size = 2
+
+        r = LRURouter([controller_prefix])
+        for path in ["/foo/1", "/foo/2", "/foo/1", "/foo/3"]:
+            r.find(*self.get_http_instances(path))
+
+        key = (controller_prefix,)
+        keys = set(Router._resolve_caches[LRURouter].keys())
+        self.assertEqual(2, len(keys))
+        self.assertTrue((key, ("foo", "1")) in keys)
+        self.assertTrue((key, ("foo", "3")) in keys)
+        self.assertFalse((key, ("foo", "2")) in keys)
+
+        keys = set(Router._resolve_caches[Router].keys())
+        for path_args in [("foo", "4"), ("foo", "5"), ("foo", "6")]:
+            self.assertTrue((key, path_args) in keys)
+
+    def test_module_trie(self):
+        controller_prefix = "moduletrie"
+        testdata.create_modules({
+            controller_prefix: "from endpoints import Controller",
+            "{}.foo".format(controller_prefix): "from endpoints import Controller",
+            "{}.foo.bar".format(controller_prefix): "from endpoints import Controller",
+            "{}.che".format(controller_prefix): "from endpoints import Controller",
+        })
+
+        r = Router([controller_prefix])
+        trie = r.get_module_trie(controller_prefix)
+        self.assertEqual({"foo": {"bar": {}}, "che": {}}, trie)
+
+        module_name, module_path, path_args = r.get_module_name(["foo", "bar", "baz"])
+        self.assertEqual("{}.foo.bar".format(controller_prefix), module_name)
+        self.assertEqual(["foo", "bar"], module_path)
+        self.assertEqual(["baz"], path_args)
+
+    def test_module_cache_dir(self):
+        controller_prefix = "modcachedir"
+        basedir = testdata.create_modules({
+            controller_prefix: [
+                "from endpoints import Controller",
+                "class Default(Controller):",
+                "    def GET(self): pass",
+            ],
+            "{}.foo".format(controller_prefix): [
+                "from endpoints import Controller",
+                "class Bar(Controller):",
+                "    def GET(self): pass",
+            ],
+        })
+        # a plain directory (not a package) with a module in it
+        pkgdir = os.path.join(basedir, controller_prefix)
+        subdir = os.path.join(pkgdir, "sub")
+        os.mkdir(subdir)
+        with open(os.path.join(subdir, "x.py"), "w") as fp:
+            fp.write("")
+
+        # set the modified times ourselves so the test doesn't depend on the
+        # filesystem's mtime resolution
+        mtime = 1000000000
+        for path in [pkgdir, subdir]:
+            os.utime(path, (mtime, mtime))
+
+        cache_dir = testdata.create_dir()
+        r = Router([controller_prefix])
+
+        mcd = environ.MODULE_CACHE_DIR
+        environ.MODULE_CACHE_DIR = cache_dir
+        try:
+            s = set([controller_prefix, "{}.foo".format(controller_prefix)])
+            self.assertEqual(s, r.find_module_names(controller_prefix))
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+            self.assertEqual(s, r.find_module_names(controller_prefix))
+
+            cache_path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            with open(cache_path) as fp:
+                cached = json.load(fp)
+            self.assertEqual(sorted(s), cached["module_names"])
+
+            # a saved name outside of the controller prefix means the file can't
+            # be trusted so the package is walked again
+            cached["module_names"].append("os")
+            with open(cache_path, "w") as fp:
+                json.dump(cached, fp)
+            self.assertEqual(s, r.find_module_names(controller_prefix))
+
+            # adding a module should invalidate the saved module names
+            testdata.create_module(
+                "{}.che".format(controller_prefix),
+                contents="",
+                tmpdir=basedir,
+                make_importable=False
+            )
+            os.utime(pkgdir, (mtime + 1, mtime + 1))
+            s.add("{}.che".format(controller_prefix))
+            self.assertEqual(s, r.find_module_names(controller_prefix))
+
+            # turning the plain directory into a package only changes the modified
+            # time of the plain directory
+            with open(os.path.join(subdir, "__init__.py"), "w") as fp:
+                fp.write("")
+            os.utime(subdir, (mtime + 1, mtime + 1))
+            s.update(["{}.sub".format(controller_prefix), "{}.sub.x".format(controller_prefix)])
+            self.assertEqual(s, r.find_module_names(controller_prefix))
+
+        finally:
+            environ.MODULE_CACHE_DIR = mcd
+
+    def test_module_cache_dir_write_error(self):
+        """a cache file that can't be written shouldn't leave temp files behind"""
+        controller_prefix = "modcachedirerror"
+        testdata.create_modules({
+            controller_prefix: DEFAULT_CONTROLLER,
+            "{}.foo".format(controller_prefix): DEFAULT_CONTROLLER,
+        })
+        cache_dir = testdata.create_dir()
+        r = Router([controller_prefix])
+
+        mcd = environ.MODULE_CACHE_DIR
+        environ.MODULE_CACHE_DIR = cache_dir
+        try:
+            s = set([controller_prefix, "{}.foo".format(controller_prefix)])
+            self.assertEqual(s, r.find_module_names(controller_prefix))
+
+            # replace the cache file with a directory so it can't be written
+            cache_names = os.listdir(cache_dir)
+            cache_path = os.path.join(cache_dir, cache_names[0])
+            os.remove(cache_path)
+            os.mkdir(cache_path)
+            with open(os.path.join(cache_path, "block"), "w") as fp:
+                fp.write("")
+
+            self.assertEqual(s, r.find_module_names(controller_prefix))
+            self.assertEqual(cache_names, os.listdir(cache_dir))
+
+        finally:
+            environ.MODULE_CACHE_DIR = mcd
+
+    def test_eager_import(self):
+        controller_prefix = "eagerimport"
+        testdata.create_modules({
+            controller_prefix: [
+                "from endpoints import Controller",
+                "class Default(Controller):",
+                "    def GET(self): pass",
+            ],
+            "{}.foo".format(controller_prefix): [
+                "from endpoints import Controller",
+                "class Bar(Controller):",
+                "    def GET(self): pass",
+            ],
+            "{}.boom".format(controller_prefix): [
+                "from does_not_exist import FairyDust",
+            ],
+        })
+
+        r = Router([controller_prefix])
+        info = r.find(*self.get_http_instances("/che"))
+        self.assertEqual("Default", info['class_name'])
+        self.assertTrue("{}.foo".format(controller_prefix) in sys.modules)
+
+        # a failure at startup could be transient so it shouldn't be remembered
+        self.assertFalse("{}.boom".format(controller_prefix) in reflection._import_errors)
+
+        # the broken module shouldn't stop the others from being imported but
+        # should still fail when requested
+        with self.assertRaises(ImportError):
+            r.find(*self.get_http_instances("/boom"))
+
+    def test_eager_import_router(self):
+        """a controller module that uses a Router while it is being imported
+        shouldn't hang the import"""
+        controller = [
+            "from endpoints import Controller",
+            "class Default(Controller):",
+            "    def GET(self): pass",
+        ]
+
+        # the Router is used in a submodule (imported while the module names are
+        # imported) and in the package (imported while the module names are found)
+        for controller_prefix, router_module_name in [
+            ("eagerrouter", "eagerrouter.index"),
+            ("eagerrouter2", "eagerrouter2"),
+        ]:
+            modules = {
+                controller_prefix: controller,
+                "{}.index".format(controller_prefix): controller,
+            }
+            modules[router_module_name] = controller + [
+                "from endpoints.call import Router",
+                "module_names = Router(['{}']).module_names".format(controller_prefix),
+            ]
+            testdata.create_modules(modules)
+
+            ret = {}
+            t = threading.Thread(target=lambda: ret.update(
+                module_names=Router([controller_prefix]).module_names
+            ))
+            t.daemon = True
+            t.start()
+            t.join(5)
+            self.assertFalse(t.is_alive())
+            self.assertEqual(
+                set([controller_prefix, "{}.index".format(controller_prefix)]),
+                ret["module_names"]
+            )
+            self.assertTrue(hasattr(sys.modules[router_module_name], "module_names"))
+
+    def test_module_names_lock(self):
+        """importing a controller package shouldn't hold the lock other prefixes
+        need, and a package using a Router while it's imported is walked once"""
+        flag_path = os.path.join(testdata.create_dir(), "flag")
+        slow_prefix = "modnameslockslow"
+        testdata.create_modules({
+            slow_prefix: DEFAULT_CONTROLLER + [
+                "import os, time",
+                "for x in range(500):",
+                "    if os.path.exists({}): break".format(repr(flag_path)),
+                "    time.sleep(0.01)",
+            ],
+        })
+        controller_prefix = "modnameslock"
+        testdata.create_modules({
+            controller_prefix: DEFAULT_CONTROLLER + [
+                "from endpoints.call import Router",
+                "module_names = Router(['{}']).module_names".format(controller_prefix),
+            ],
+            "{}.foo".format(controller_prefix): DEFAULT_CONTROLLER,
+        })
+
+        slow = threading.Thread(target=lambda: Router([slow_prefix]).module_names)
+        slow.daemon = True
+        slow.start()
+
+        calls = []
+        find_module_names = Router.find_module_names
+        def counted(self, controller_prefix):
+            calls.append(controller_prefix)
+            return find_module_names(self, controller_prefix)
+        Router.find_module_names = counted
+
+        try:
+            for x in range(100):
+                if slow_prefix in sys.modules: break
+                time.sleep(0.01)
+
+            ret = {}
+            t = threading.Thread(target=lambda: ret.update(
+                module_names=Router([controller_prefix]).module_names
+            ))
+            t.daemon = True
+            t.start()
+            t.join(3)
+            self.assertFalse(t.is_alive())
+            self.assertEqual(
+                set([controller_prefix, "{}.foo".format(controller_prefix)]),
+                ret["module_names"]
+            )
+            self.assertEqual([controller_prefix], calls)
+
+        finally:
+            Router.find_module_names = find_module_names
+            with open(flag_path, "w") as fp:
+                fp.write("")
+            slow.join(5)
+
     def test_default_match_with_path(self):
         """when the default controller is used, make sure it falls back to default class
         name if the path bit fails to be a controller class name"""
@@ -216,33 +550,15 @@ class RouterTest(TestCase):
     def test_get_controller_info(self):
         controller_prefix = "controller_info_advanced"
         r = testdata.create_modules({
-            controller_prefix: [
-                "from endpoints import Controller",
-                "class Default(Controller):",
-                "    def GET(*args, **kwargs): pass",
-                ""
-            ],
-            "{}.default".format(controller_prefix): [
-                "from endpoints import Controller",
-                "class Default(Controller):",
-                "    def GET(*args, **kwargs): pass",
-                ""
-            ],
-            "{}.foo".format(controller_prefix): [
-                "from endpoints import Controller",
-                "class Default(Controller):",
-                "    def GET(*args, **kwargs): pass",
-                "",
+            controller_prefix: DEFAULT_CONTROLLER,
+            "{}.default".format(controller_prefix): DEFAULT_CONTROLLER,
+            "{}.foo".format(controller_prefix): DEFAULT_CONTROLLER + [
                 "class Bar(Controller):",
                 "    def GET(*args, **kwargs): pass",
                 "    def POST(*args, **kwargs): pass",
                 ""
             ],
-            "{}.foo.baz".format(controller_prefix): [
-                "from endpoints import Controller",
-                "class Default(Controller):",
-                "    def GET(*args, **kwargs): pass",
-                "",
+            "{}.foo.baz".format(controller_prefix): DEFAULT_CONTROLLER + [
                 "class Che(Controller):",
                 "    def GET(*args, **kwargs): pass",
                 ""
@@ -322,13 +638,9 @@ class RouterTest(TestCase):
             },
         ]
 
+        r = Router([controller_prefix])
         for t in ts:
             req, res = self.get_http_instances(**t['in'])
-#             r = Request()
-#             for key, val in t['in'].items():
-#                 setattr(r, key, val)
-
-            r = Router([controller_prefix])
             d = r.find(req, res)
             for key, val in t['out'].items():
                 self.assertEqual(val, d[key])
@@ -523,6 +835,23 @@ class CallVersioningTest(TestCase):
         v = r.version("plain/text")
         self.assertEqual("", v)
 
+    def test_get_version_header_change(self):
+        """version() remembers parsed accept headers, make sure changing the accept
+        header of the same request still changes the version"""
+        r = Request()
+        r.set_header('accept', 'application/json;version=v1')
+        self.assertEqual('v1', r.version())
+
+        r.set_header('accept', 'application/json;version=v2')
+        self.assertEqual('v2', r.version())
+
+        r.headers = {}
+        self.assertEqual("", r.version())
+
+        r.set_header('accept', 'application/json;version=v1')
+        self.assertEqual('v1', r.version())
+        self.assertEqual("", r.version("plain/text"))
+
     def test_get_version_default(self):
         """turns out, calls were failing if there was no accept header even if there were defaults set"""
         r = Request()
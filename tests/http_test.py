@@ -23,6 +23,25 @@ class EnvironTest(TestCase):
 
 
 class HeadersTest(TestCase):
+    def test_name_cache(self):
+        """the normalized name cache shouldn't leak between classes that normalize
+        differently"""
+        class UpperHeaders(Headers):
+            def _convert_string_part(self, bit):
+                return bit.upper()
+
+        d = Headers()
+        d["content_type"] = "text/plain"
+        self.assertEqual(["Content-Type"], list(d.keys()))
+
+        d = UpperHeaders()
+        d["content_type"] = "text/plain"
+        self.assertEqual(["CONTENT-TYPE"], list(d.keys()))
+
+        d = Headers()
+        d["content_type"] = "text/plain"
+        self.assertEqual(["Content-Type"], list(d.keys()))
+
     def test_midbody_capital_letter(self):
         """Previously, before June 2019, our headers didn't handle WebSocket correctly
         instead lowercasing the S to Websocket"""
@@ -1,6 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
 
+from unittest import skipIf
+try:
+    from shutil import which
+except ImportError:
+    # py2
+    from distutils.spawn import find_executable as which
+
+try:
+    import gevent
+except ImportError:
+    gevent = None
+
 import testdata
 
 from endpoints.compat.environ import *
@@ -8,70 +20,73 @@ from endpoints.interface.uwsgi.client import WebServer, WebsocketServer
 from . import WebTestCase, WebServerTestCase, WebsocketTestCase
 
 
+# the servers are started by running the uwsgi binary, so without it every test
+# in this module would just wait on a server that never comes up
+has_uwsgi = bool(which("uwsgi"))
+
+
+config_header = (
+    "import os",
+    "import sys",
+    "import logging",
+    "logging.basicConfig(",
+    "    format=\"[%(levelname).1s] %(message)s\",",
+    "    level=logging.DEBUG,",
+    "    stream=sys.stdout",
+    ")",
+    "",
+)
+"""the lines every uwsgi config module starts with"""
+
+
+def get_config_contents(application_import, config_contents):
+    """build the uwsgi config module lines
+
+    :param application_import: string, the line that imports the Application class
+    :param config_contents: string|list, the test specific config lines
+    :returns: list, the lines of the config module
+    """
+    return list(config_header) + [
+        application_import,
+        "",
+        "##############################################################",
+        config_contents if isinstance(config_contents, basestring) else "\n".join(config_contents),
+        "##############################################################",
+        "application = Application()",
+        ""
+    ]
+
+
+@skipIf(not has_uwsgi, "uwsgi is not installed")
 class WebTest(WebTestCase):
 
     server_class = WebServer
 
     def create_server(self, contents, config_contents='', **kwargs):
-        config_contents = [
-            "import os",
-            "import sys",
-            "import logging",
-            "logging.basicConfig(",
-            "    format=\"[%(levelname).1s] %(message)s\",",
-            "    level=logging.DEBUG,",
-            "    stream=sys.stdout",
-            ")",
-            "",
-            "from endpoints.interface.uwsgi import Application",
-            ""
-            "##############################################################",
-            config_contents if isinstance(config_contents, basestring) else "\n".join(config_contents),
-            "##############################################################",
-            "application = Application()",
-            ""
-        ]
-
         return super(WebTest, self).create_server(
             contents=contents,
-            config_contents=config_contents,
+            config_contents=get_config_contents(
+                "from endpoints.interface.uwsgi import Application",
+                config_contents,
+            ),
         )
 
 
+@skipIf(not has_uwsgi or not gevent, "uwsgi and gevent are not installed")
 class WebsocketTest(WebsocketTestCase):
     server_class = WebsocketServer
 
     def create_server(self, contents, config_contents='', **kwargs):
-        config_contents = [
-            "import os",
-            "import sys",
-            "import logging",
-            "logging.basicConfig(",
-            "    format=\"[%(levelname).1s] %(message)s\",",
-            "    level=logging.DEBUG,",
-            "    stream=sys.stdout",
-            ")",
-            "",
-            #"import gevent",
-            #"import gevent.monkey",
-            #"if not gevent.monkey.saved:",
-            #"    gevent.monkey.patch_all()",
-            "",
-            "from endpoints.interface.uwsgi.async import WebsocketApplication as Application",
-            "",
-            "##############################################################",
-            config_contents if isinstance(config_contents, basestring) else "\n".join(config_contents),
-            "##############################################################",
-            "application = Application()",
-            ""
-        ]
-
         return super(WebsocketTest, self).create_server(
             contents=contents,
-            config_contents=config_contents,
+            config_contents=get_config_contents(
+                "from endpoints.interface.uwsgi.async import WebsocketApplication as Application",
+                config_contents,
+            ),
         )
 
 
+@skipIf(not has_uwsgi, "uwsgi is not installed")
 class WebServerTest(WebServerTestCase, WebTest):
     pass
 
@@ -2,6 +2,11 @@
 from __future__ import unicode_literals, division, print_function, absolute_import
 from . import TestCase, SkipTest
 import os
+import sys
+import time
+import threading
+import weakref
+import gc
 
 import testdata
 
@@ -14,7 +19,9 @@ from endpoints.reflection import (
     ReflectPath,
     ReflectHTTPMethod,
     ReflectClass,
+    clear_import_errors,
 )
+from endpoints.utils import String
 
 
 class ReflectTest(TestCase):
@@ -363,87 +370,58 @@ class ReflectTest(TestCase):
 
 class ReflectControllerTest(TestCase):
     def test_method_required_args(self):
-        mp = testdata.create_module(contents=[
+        controller_prefix = "method_required_args"
+        header = [
             "from endpoints import param, version, Controller",
             "class Foo(Controller):",
-            "    @param(0)",
-            "    @param('one')",
-            "    def POST(self, *args, **kwargs): pass",
-        ])
-        rmod = ReflectModule(mp)
-        rm = ReflectHTTPMethod("POST", mp.module.Foo.POST, ReflectController(rmod, mp.module.Foo, mp))
-        r = rm.required_args
-        self.assertEqual([0], r)
-
-        mp = testdata.create_module(contents=[
-            "from endpoints import param, version, Controller",
-            "class Foo(Controller):",
-            "    @param(0)",
-            "    @param('one')",
-            "    def POST(self, zero, one): pass",
-        ])
-        rmod = ReflectModule(mp)
-        rm = ReflectHTTPMethod("POST", mp.module.Foo.POST, ReflectController(rmod, mp.module.Foo, mp))
-        r = rm.required_args
-        self.assertEqual(["zero"], r)
-
-        mp = testdata.create_module(contents=[
-            "from endpoints import param, version, Controller",
-            "class Foo(Controller):",
-            "    @param(0)",
-            "    @param(1, default=1)",
-            "    def POST(self, *args): pass",
-        ])
-        rmod = ReflectModule(mp)
-        rm = ReflectHTTPMethod("POST", mp.module.Foo.POST, ReflectController(rmod, mp.module.Foo, mp))
-        r = rm.required_args
-        self.assertEqual([0], r)
-
-        mp = testdata.create_module(contents=[
-            "from endpoints import param, version, Controller",
-            "class Foo(Controller):",
-            "    @param(0)",
-            "    @param(1, default=1)",
-            "    def POST(self, zero, *args): pass",
-        ])
-        rmod = ReflectModule(mp)
-        rm = ReflectHTTPMethod("POST", mp.module.Foo.POST, ReflectController(rmod, mp.module.Foo, mp))
-        r = rm.required_args
-        self.assertEqual(["zero"], r)
-
-        mp = testdata.create_module(contents=[
-            "from endpoints import param, version, Controller",
-            "class Foo(Controller):",
-            "    @param(0)",
-            "    @param(1, default=1)",
-            "    def POST(self, zero, one): pass",
-        ])
-        rmod = ReflectModule(mp)
-        rm = ReflectHTTPMethod("POST", mp.module.Foo.POST, ReflectController(rmod, mp.module.Foo, mp))
-        r = rm.required_args
-        self.assertEqual(["zero"], r)
+        ]
+        tests = [
+            ([
+                "    @param(0)",
+                "    @param('one')",
+                "    def POST(self, *args, **kwargs): pass",
+            ], [0]),
+            ([
+                "    @param(0)",
+                "    @param('one')",
+                "    def POST(self, zero, one): pass",
+            ], ["zero"]),
+            ([
+                "    @param(0)",
+                "    @param(1, default=1)",
+                "    def POST(self, *args): pass",
+            ], [0]),
+            ([
+                "    @param(0)",
+                "    @param(1, default=1)",
+                "    def POST(self, zero, *args): pass",
+            ], ["zero"]),
+            ([
+                "    @param(0)",
+                "    @param(1, default=1)",
+                "    def POST(self, zero, one): pass",
+            ], ["zero"]),
+            ([
+                "    @param(0, default=0)",
+                "    @param(1, default=1)",
+                "    def POST(self, zero, one): pass",
+            ], []),
+            ([
+                "    def POST(self, one, two=2, three=3): pass",
+            ], ["one"]),
+        ]
 
-        mp = testdata.create_module(contents=[
-            "from endpoints import param, version, Controller",
-            "class Foo(Controller):",
-            "    @param(0, default=0)",
-            "    @param(1, default=1)",
-            "    def POST(self, zero, one): pass",
-        ])
-        rmod = ReflectModule(mp)
-        rm = ReflectHTTPMethod("POST", mp.module.Foo.POST, ReflectController(rmod, mp.module.Foo, mp))
-        r = rm.required_args
-        self.assertEqual([], r)
+        # create all the modules at once instead of a new module (and tmpdir) for
+        # each case
+        testdata.create_modules({
+            "{}.m{}".format(controller_prefix, i): header + contents for i, (contents, _) in enumerate(tests)
+        })
 
-        mp = testdata.create_module(contents=[
-            "from endpoints import param, version, Controller",
-            "class Foo(Controller):",
-            "    def POST(self, one, two=2, three=3): pass",
-        ])
-        rmod = ReflectModule(mp)
-        rm = ReflectHTTPMethod("POST", mp.module.Foo.POST, ReflectController(rmod, mp.module.Foo, mp))
-        r = rm.required_args
-        self.assertEqual(1, len(r))
+        for i, (_, expected) in enumerate(tests):
+            rmod = ReflectModule("{}.m{}".format(controller_prefix, i))
+            foo = rmod.module.Foo
+            rm = ReflectHTTPMethod("POST", foo.POST, ReflectController(rmod, foo, rmod.module_name))
+            self.assertEqual(expected, rm.required_args)
 
     def test__get_methods_info(self):
         mp = testdata.create_module(contents=[
@@ -648,6 +626,73 @@ class ReflectModuleTest(TestCase):
         r = ReflectModule(controller_prefix)
         self.assertEqual(set(['mmp2']), r.module_names)
 
+    def test_module_import_error(self):
+        """a module that fails to import shouldn't be run again on the next import"""
+        counter = testdata.create_module(contents="count = 0")
+        controller_prefix = testdata.create_module(contents=[
+            "import {}".format(counter),
+            "{}.count += 1".format(counter),
+            "from does_not_exist import FairyDust",
+        ])
+        counter = ReflectModule(counter).module
+
+        class Request(object): pass
+        def handle(request):
+            return ReflectModule(controller_prefix).module
+
+        # the first failure is the real ImportError, and remembering it shouldn't
+        # keep the request it happened in alive
+        req = Request()
+        req_ref = weakref.ref(req)
+        try:
+            handle(req)
+
+        except ImportError:
+            pass
+
+        else:
+            self.fail("ImportError was not raised")
+
+        del req
+        gc.collect()
+        self.assertIsNone(req_ref())
+
+        # the remembered failure should still point to the module that failed
+        module_filename = "{}.py".format(controller_prefix)
+        with self.assertRaises(ImportError) as cm:
+            handle(Request())
+        self.assertTrue(String(cm.exception).endswith("({}:3)".format(module_filename)))
+        self.assertTrue(module_filename in cm.exception.traceback)
+        self.assertEqual(1, counter.count)
+
+        clear_import_errors(controller_prefix)
+        with self.assertRaises(ImportError):
+            handle(Request())
+        self.assertEqual(2, counter.count)
+
+    def test_module_initializing(self):
+        """a module another thread is still importing shouldn't be returned half
+        executed"""
+        controller_prefix = testdata.create_module(contents=[
+            "import time",
+            "time.sleep(0.5)",
+            "class Foo(object): pass",
+        ])
+
+        t = threading.Thread(target=lambda: ReflectModule(controller_prefix).module)
+        t.start()
+        try:
+            for x in range(100):
+                if controller_prefix in sys.modules: break
+                time.sleep(0.01)
+
+            self.assertTrue(controller_prefix in sys.modules)
+            m = ReflectModule(controller_prefix).module
+            self.assertTrue(hasattr(m, "Foo"))
+
+        finally:
+            t.join()
+
     def test_routing_module(self):
         controller_prefix = "routing_module"
         contents = [